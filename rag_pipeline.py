@@ -1,17 +1,39 @@
 import os
 import re
+import json
+import asyncio
+import hashlib
+import shutil
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
+import faiss
+import numpy as np
+
+try:
+    import uvloop  # optional faster event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
 from dotenv import load_dotenv
 load_dotenv()
 
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_core.documents import Document as LC_Document
+from langchain_core.embeddings import Embeddings
 
 FAISS_INDEX_DIR = "faiss_index"
+MANIFEST_PATH = os.path.join(FAISS_INDEX_DIR, "manifest.json")
+EMBED_CACHE_PATH = "embedding_cache.sqlite"
+ANSWER_CACHE_DIR = "answer_cache"
+LLM_DATE_CACHE_PATH = "llm_date_cache.json"
 
 # Data Models
 @dataclass
@@ -24,14 +46,113 @@ class Chunk:
     text: str
     metadata: Dict[str, str]
 
+@dataclass
+class RetrievedChunks:
+    """
+    Retrieval results with the fields used for filtering and ranking held
+    as parallel arrays, so both steps are single vectorized operations.
+    """
+    chunks: List[Chunk]
+    doc_types: np.ndarray  # str, one per chunk
+    ordinals: np.ndarray   # int32 effective_ordinal, -1 when undated
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def select(self, mask: np.ndarray) -> "RetrievedChunks":
+        return RetrievedChunks(
+            chunks=[chunk for chunk, keep in zip(self.chunks, mask) if keep],
+            doc_types=self.doc_types[mask],
+            ordinals=self.ordinals[mask]
+        )
+
 # Configuration
 KNOWLEDGE_BASE_DIR = "knowledge_base"
 CHUNK_SIZE = 500
 TOP_K = 4
+EMBED_MODEL = "text-embedding-3-small"  # SEMANTIC_CACHE_THRESHOLD is calibrated for this model
+LLM_MODEL = "gpt-4o-mini"
+EMBED_BATCH = 256  # texts per embeddings request (API limit is 2048)
+EMBED_MAX_RETRIES = 6
+EMBED_CONCURRENCY = 8  # embedding requests in flight at once
+QUERY_CACHE_SIZE = 10_000  # in-memory LRU entries for query embeddings
+HNSW_M = 32  # graph neighbours per node
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+# Vectors are stored as fp16 (half of float32); QT_8bit quarters it but needs training data
+INDEX_QUANTIZATION = faiss.ScalarQuantizer.QT_fp16
+SEMANTIC_CACHE_THRESHOLD = 0.92  # min cosine similarity to reuse a cached answer
+LLM_EXCERPT_CHARS = 500  # document head sent to the LLM for date extraction
+DATE_PROBE_CHARS = 2048  # dates are only looked for in the head of a file
+LOAD_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+DEBUG = bool(os.environ.get("RAG_DEBUG"))
+
+# Date Patterns (compiled once at import time)
+MONTH_MAP = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4,
+    'may': 5, 'jun': 6, 'jul': 7, 'aug': 8,
+    'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+
+_RE_YEAR = re.compile(r'(\d{4})')
+_RE_YMD = re.compile(r'(\d{4})[-_](\d{2})[-_](\d{2})')
+_RE_MONTH_YEAR = re.compile(r'([A-Za-z]{3,9})[-_](\d{4})', re.IGNORECASE)
+
+# One alternation per marker kind; m.lastgroup names the branch that matched
+_RE_CONTENT_DATE = re.compile(
+    r"Effective Date:\s*(?P<eff>[A-Za-z]+\s+\d{1,2},\s+\d{4})"
+    r"|(?:Last\s+)?Updated:\s*(?P<upd>[A-Za-z]+\s+\d{4})"
+    r"|(?:As of|Valid from|Issued):\s*(?P<asof>[A-Za-z]+\s+\d{1,2}?,?\s+\d{4})",
+    re.IGNORECASE
+)
+# Literal needles that every _RE_CONTENT_DATE branch contains (lowercase)
+_CONTENT_DATE_MARKERS = ("effective date:", "updated:", "as of:", "valid from:", "issued:")
+_RE_PARA = re.compile(r'\n+')
+_RE_JSON_ARRAY = re.compile(r'\[.*\]', re.DOTALL)
+
+_CONTENT_DATE_FORMATS = {
+    "eff": ("%b %d, %Y",),
+    "upd": ("%B %Y", "%b %Y"),
+    "asof": ("%B %d %Y", "%b %d %Y", "%B %Y", "%b %Y"),
+}
+# Marker precedence: an "Effective Date" anywhere beats "Updated", which beats "As of"
+_CONTENT_DATE_PRIORITY = ("eff", "upd", "asof")
+_CONTENT_DATE_LABELS = {
+    "eff": "Effective Date",
+    "upd": "Updated",
+    "asof": "date variant",
+}
 
 # Utility Functions
+def _dbg(*args) -> None:
+    # Tracing is only printed when RAG_DEBUG is set; warnings still use print()
+    if DEBUG:
+        print(*args)
+
+
+def _write_atomic(path: str, write) -> None:
+    # write(tmp_path) fills a sibling temp file that then replaces path in one step,
+    # so an interrupted run never leaves a half-written file behind
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_json_atomic(path: str, data, **dump_kwargs) -> None:
+    def write(tmp_path: str) -> None:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+    _write_atomic(path, write)
+
+
+@lru_cache(maxsize=4)
+def _get_llm(model: str = LLM_MODEL, temperature: float = 0.0) -> ChatOpenAI:
+    # One client per (model, temperature) so its HTTP connection pool is reused
+    return ChatOpenAI(model=model, temperature=temperature)
+
+
 def classify_document(filename: str) -> str:
-    print("Classifying the documents")
+    _dbg("Classifying the documents")
     if "policy" in filename.lower():
         return "policy"
     return "noise"
@@ -45,124 +166,126 @@ def extract_date_from_filename(filename: str) -> Optional[datetime]:
     - policy_Jan_2024.txt
     - WFH_Policy_2024.txt
     """
-    print(f"  → Trying filename pattern extraction for: {filename}")
+    _dbg(f"  → Trying filename pattern extraction for: {filename}")
     
     # Pattern 1: YYYY (just year)
-    match = re.search(r'(\d{4})', filename)
+    match = _RE_YEAR.search(filename)
     if match:
         year = int(match.group(1))
         if 2000 <= year <= 2099:
-            print(f"    ✓ Found year in filename: {year}")
+            _dbg(f"    ✓ Found year in filename: {year}")
             return datetime(year, 1, 1)
     
     # Pattern 2: YYYY_MM_DD or YYYY-MM-DD
-    match = re.search(r'(\d{4})[-_](\d{2})[-_](\d{2})', filename)
+    match = _RE_YMD.search(filename)
     if match:
         try:
             date = datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
-            print(f"    ✓ Found full date in filename: {date.strftime('%Y-%m-%d')}")
+            _dbg(f"    ✓ Found full date in filename: {date.strftime('%Y-%m-%d')}")
             return date
         except ValueError:
             pass
     
     # Pattern 3: Month_YYYY (e.g., Jan_2024)
-    month_map = {
-        'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4,
-        'may': 5, 'jun': 6, 'jul': 7, 'aug': 8,
-        'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
-    }
-    match = re.search(r'([A-Za-z]{3,9})[-_](\d{4})', filename.lower())
+    match = _RE_MONTH_YEAR.search(filename)
     if match:
-        month_str = match.group(1)[:3]
+        month = MONTH_MAP.get(match.group(1)[:3].lower())
         year = int(match.group(2))
-        if month_str in month_map and 2000 <= year <= 2099:
-            date = datetime(year, month_map[month_str], 1)
-            print(f"    ✓ Found month-year in filename: {date.strftime('%b %Y')}")
+        if month and 2000 <= year <= 2099:
+            date = datetime(year, month, 1)
+            _dbg(f"    ✓ Found month-year in filename: {date.strftime('%b %Y')}")
             return date
     
-    print("    ✗ No date pattern found in filename")
+    _dbg("    ✗ No date pattern found in filename")
     return None
 
 
-def extract_date_from_content(text: str) -> Optional[datetime]:
-    """
-    Extract date from various patterns in document content.
+@lru_cache(maxsize=1024)
+def _parse_content_date(kind: str, date_str: str) -> Optional[datetime]:
     """
-    print("  → Trying content date extraction")
+    Parse the date captured by _RE_CONTENT_DATE using the formats
+    allowed for that kind of marker.
     
-    # Pattern 1: "Effective Date: Jan 1, 2024" (original)
-    match = re.search(
-        r"Effective Date:\s*([A-Za-z]+\s+\d{1,2},\s+\d{4})",
-        text,
-        re.IGNORECASE
-    )
-    if match:
-        try:
-            date = datetime.strptime(match.group(1), "%b %d, %Y")
-            print(f"    ✓ Found 'Effective Date': {date.strftime('%b %d, %Y')}")
-            return date
-        except ValueError:
-            pass
-    
-    # Pattern 2: "(Effective Date: Jan 1, 2024)" with parentheses
-    match = re.search(
-        r"\(Effective Date:\s*([A-Za-z]+\s+\d{1,2},\s+\d{4})\)",
-        text,
-        re.IGNORECASE
-    )
-    if match:
+    Memoized: policy versions tend to repeat the same date strings, and
+    caching here also covers strings that fail every format.
+    """
+    if kind == "asof":
+        date_str = date_str.replace(',', '').strip()
+    for fmt in _CONTENT_DATE_FORMATS[kind]:
         try:
-            date = datetime.strptime(match.group(1), "%b %d, %Y")
-            print(f"    ✓ Found 'Effective Date' (parenthesized): {date.strftime('%b %d, %Y')}")
-            return date
+            return datetime.strptime(date_str, fmt)
         except ValueError:
-            pass
+            continue
+    return None
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _find_standalone_year(text: str) -> Optional[int]:
+    """
+    First "20YY" in `text` that is a whole word (not preceded or followed
+    by a letter, digit or underscore), found with str.find instead of re.
+    """
+    i = text.find("20")
+    while i != -1:
+        end = i + 4
+        if (
+            end <= len(text)
+            and text[i + 2] in "0123456789"
+            and text[i + 3] in "0123456789"
+            and (i == 0 or not _is_word_char(text[i - 1]))
+            and (end == len(text) or not _is_word_char(text[end]))
+        ):
+            return int(text[i:end])
+        i = text.find("20", i + 1)
+    return None
+
+
+def extract_date_from_content(text: str) -> Optional[datetime]:
+    """
+    Extract date from various patterns in document content.
     
-    # Pattern 3: "Updated: Jan 2024" or "Last Updated: January 2024"
-    match = re.search(
-        r"(?:Updated|Last Updated):\s*([A-Za-z]+\s+\d{4})",
-        text,
-        re.IGNORECASE
-    )
-    if match:
-        try:
-            date = datetime.strptime(match.group(1), "%B %Y")
-            print(f"    ✓ Found 'Updated': {date.strftime('%b %Y')}")
-            return date
-        except ValueError:
-            try:
-                date = datetime.strptime(match.group(1), "%b %Y")
-                print(f"    ✓ Found 'Updated': {date.strftime('%b %Y')}")
-                return date
-            except ValueError:
-                pass
+    `text` is expected to be the head of the document (see
+    DATE_PROBE_CHARS), not the full file. All explicit date markers are
+    matched in a single pass; among markers whose date parses, the kind
+    priority in _CONTENT_DATE_PRIORITY decides (not position in the text),
+    and within a kind the first occurrence wins.
+    """
+    _dbg("  → Trying content date extraction")
     
-    # Pattern 4: "As of January 2024" or "Valid from: Jan 1, 2024"
-    match = re.search(
-        r"(?:As of|Valid from|Issued):\s*([A-Za-z]+\s+\d{1,2}?,?\s+\d{4})",
-        text,
-        re.IGNORECASE
-    )
-    if match:
-        date_str = match.group(1).replace(',', '').strip()
-        for fmt in ["%B %d %Y", "%b %d %Y", "%B %Y", "%b %Y"]:
-            try:
-                date = datetime.strptime(date_str, fmt)
-                print(f"    ✓ Found date variant: {date.strftime('%b %d, %Y')}")
-                return date
-            except ValueError:
+    # Patterns 1-4: "Effective Date: Jan 1, 2024", "Last Updated: January 2024",
+    # "Valid from: Jan 1, 2024", ...
+    # Most documents carry no marker at all; a substring check is enough to
+    # skip the regex for them.
+    lowered = text.lower()
+    if any(marker in lowered for marker in _CONTENT_DATE_MARKERS):
+        found: Dict[str, datetime] = {}
+        for match in _RE_CONTENT_DATE.finditer(text):
+            kind = match.lastgroup
+            if kind in found:
                 continue
+            date = _parse_content_date(kind, match.group(kind))
+            if date:
+                found[kind] = date
+                if kind == _CONTENT_DATE_PRIORITY[0]:
+                    break
+
+        for kind in _CONTENT_DATE_PRIORITY:
+            if kind in found:
+                date = found[kind]
+                _dbg(f"    ✓ Found '{_CONTENT_DATE_LABELS[kind]}': {date.strftime('%b %d, %Y')}")
+                return date
     
     # Pattern 5: Just a year in the first few lines (fallback)
-    first_200_chars = text[:200]
-    match = re.search(r'\b(20\d{2})\b', first_200_chars)
-    if match:
-        year = int(match.group(1))
+    year = _find_standalone_year(text[:200])
+    if year:
         date = datetime(year, 1, 1)
-        print(f"    ✓ Found year in content: {year}")
+        _dbg(f"    ✓ Found year in content: {year}")
         return date
     
-    print("    ✗ No date pattern found in content")
+    _dbg("    ✗ No date pattern found in content")
     return None
 
 
@@ -170,10 +293,10 @@ def get_file_modification_date(filepath: str) -> datetime:
     """
     Get file modification timestamp as fallback.
     """
-    print(f"  → Using file modification date as fallback")
+    _dbg(f"  → Using file modification date as fallback")
     timestamp = os.path.getmtime(filepath)
     date = datetime.fromtimestamp(timestamp)
-    print(f"    ✓ File modified: {date.strftime('%Y-%m-%d %H:%M:%S')}")
+    _dbg(f"    ✓ File modified: {date.strftime('%Y-%m-%d %H:%M:%S')}")
     return date
 
 
@@ -187,7 +310,7 @@ def extract_effective_date(text: str, filename: str, filepath: str = None) -> da
     3. File modification timestamp (fallback)
     4. Default to epoch start (last resort)
     """
-    print(f"\nExtracting effective date for: {filename}")
+    _dbg(f"\nExtracting effective date for: {filename}")
     
     # Strategy 1: Extract from content (highest priority)
     content_date = extract_date_from_content(text)
@@ -209,132 +332,552 @@ def extract_effective_date(text: str, filename: str, filepath: str = None) -> da
     return datetime(1970, 1, 1)
 
 
+def _load_llm_date_cache() -> Dict[str, str]:
+    if not os.path.exists(LLM_DATE_CACHE_PATH):
+        return {}
+    with open(LLM_DATE_CACHE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_llm_date_cache(cache: Dict[str, str]) -> None:
+    _write_json_atomic(LLM_DATE_CACHE_PATH, cache, indent=2, sort_keys=True)
+
+
+def _parse_llm_date(raw: Optional[str]) -> Optional[datetime]:
+    if not raw or raw == "NONE":
+        return None
+    try:
+        return datetime.strptime(raw, "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+DATE_PROMPT = """Extract the effective date or creation date from each policy document below.
+Return ONLY a JSON array with one object per document:
+[{{"idx": <document number>, "date": "YYYY-MM-DD"}}]
+If no date is found for a document, use "NONE" as its date.
+
+Document excerpts:
+{excerpts}
+
+JSON:"""
+
+
+def extract_dates_batch(docs: List[Tuple[str, str]]) -> Dict[str, Optional[datetime]]:
+    """
+    Use LLM to extract dates for many documents when regex patterns fail.
+    This is an advanced fallback but costs API calls, so all (filename, text)
+    pairs go out in one request, and answers are cached on disk by the
+    sha256 of the model, prompt and excerpt so re-runs skip the call entirely.
+    """
+    _dbg(f"  → Trying LLM-based date extraction for {len(docs)} document(s) (advanced fallback)")
+
+    cache = _load_llm_date_cache()
+    key_prefix = f"{LLM_MODEL}\0{DATE_PROMPT}\0"
+    keys = {
+        filename: hashlib.sha256((key_prefix + text[:LLM_EXCERPT_CHARS]).encode("utf-8")).hexdigest()
+        for filename, text in docs
+    }
+    pending = [
+        (filename, text[:LLM_EXCERPT_CHARS]) for filename, text in docs
+        if keys[filename] not in cache
+    ]
+
+    if pending:
+        excerpts = "\n\n".join(
+            f"[{i}]\n{excerpt}" for i, (_, excerpt) in enumerate(pending, 1)
+        )
+        prompt = DATE_PROMPT.format(excerpts=excerpts)
+
+        try:
+            response = _get_llm().invoke(prompt).content.strip()
+            match = _RE_JSON_ARRAY.search(response)
+            for item in json.loads(match.group(0) if match else response):
+                idx = int(item["idx"])
+                if 1 <= idx <= len(pending):
+                    cache[keys[pending[idx - 1][0]]] = str(item["date"]).strip()
+            _save_llm_date_cache(cache)
+        except Exception as e:
+            print(f"    ✗ LLM extraction failed: {e}")
+
+    dates = {}
+    for filename in keys:
+        dates[filename] = _parse_llm_date(cache.get(keys[filename]))
+        if dates[filename]:
+            _dbg(f"    ✓ LLM extracted date for {filename}: {dates[filename].strftime('%Y-%m-%d')}")
+        else:
+            _dbg(f"    ✗ LLM found no date for {filename}")
+    return dates
+
+
 def extract_effective_date_with_llm(text: str, filename: str) -> Optional[datetime]:
     """
-    Use LLM to extract date when regex patterns fail.
-    This is an advanced fallback but costs API calls.
+    Single-document form of extract_dates_batch.
     """
-    print("  → Trying LLM-based date extraction (advanced fallback)")
-    
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    
-    prompt = f"""Extract the effective date or creation date from this policy document.
-Return ONLY the date in format: YYYY-MM-DD
-If no date is found, return: NONE
+    return extract_dates_batch([(filename, text)])[filename]
 
-Document excerpt:
-{text[:500]}
 
-Date (YYYY-MM-DD or NONE):"""
+# 1. Document Ingestion (IMPROVED)
+def list_knowledge_base() -> List[str]:
+    with os.scandir(KNOWLEDGE_BASE_DIR) as entries:
+        return [
+            entry.name for entry in entries
+            if entry.name.endswith(".txt") and entry.is_file()
+        ]
+
+
+def scan_knowledge_base(manifest: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Map every knowledge base file to {"sha256", "mtime_ns", "size"}.
     
-    try:
-        response = llm.invoke(prompt).content.strip()
-        if response == "NONE":
-            print("    ✗ LLM found no date")
-            return None
-        
-        # Try to parse the response
-        date = datetime.strptime(response, "%Y-%m-%d")
-        print(f"    ✓ LLM extracted date: {date.strftime('%Y-%m-%d')}")
-        return date
-    except Exception as e:
-        print(f"    ✗ LLM extraction failed: {e}")
-        return None
+    Only files whose mtime or size differ from the manifest are read and
+    hashed; for the rest the recorded sha256 is reused, so an unchanged
+    corpus costs one stat per file.
+    """
+    file_states = {}
+    with os.scandir(KNOWLEDGE_BASE_DIR) as entries:
+        for entry in entries:
+            if not (entry.name.endswith(".txt") and entry.is_file()):
+                continue
+            stat = entry.stat()
+            recorded = manifest.get(entry.name, {})
+            if recorded.get("mtime_ns") == stat.st_mtime_ns and recorded.get("size") == stat.st_size:
+                sha256 = recorded["sha256"]
+            else:
+                with open(entry.path, "rb") as f:
+                    sha256 = hashlib.sha256(f.read()).hexdigest()
+            file_states[entry.name] = {
+                "sha256": sha256,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size
+            }
+    return file_states
 
 
-# 1. Document Ingestion (IMPROVED)
-def load_documents() -> List[Document]:
-    documents = []
+def _load_one(filename: str) -> Document:
+    path = os.path.join(KNOWLEDGE_BASE_DIR, filename)
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(DATE_PROBE_CHARS)
+        content = head + f.read()
 
-    for filename in os.listdir(KNOWLEDGE_BASE_DIR):
-        if not filename.endswith(".txt"):
-            continue
+    # Extract effective date using multi-strategy approach
+    effective_date = extract_effective_date(head, filename, path)
+
+    return Document(
+        content=content,
+        metadata={
+            "filename": filename,
+            "doc_type": classify_document(filename),
+            "effective_date": effective_date.isoformat(),  # Store as ISO string
+            "effective_year": str(effective_date.year),
+            "effective_ordinal": str(effective_date.toordinal())  # Day number, for ranking
+        }
+    )
 
-        path = os.path.join(KNOWLEDGE_BASE_DIR, filename)
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        # Extract effective date using multi-strategy approach
-        effective_date = extract_effective_date(content, filename, path)
-
-        documents.append(
-            Document(
-                content=content,
-                metadata={
-                    "filename": filename,
-                    "doc_type": classify_document(filename),
-                    "effective_date": effective_date.isoformat(),  # Store as ISO string
-                    "effective_year": str(effective_date.year)
-                }
-            )
-        )
-        
 
-    return documents
+def load_documents(filenames: Optional[List[str]] = None) -> List[Document]:
+    """
+    Read and date every file on a thread pool; files share no state, so
+    disk reads overlap with date extraction. Order follows `filenames`.
+    """
+    if filenames is None:
+        filenames = list_knowledge_base()
+
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        return list(executor.map(_load_one, filenames))
 
 
 # 2. Chunking (with metadata inheritance)
 def chunk_documents(documents: List[Document]) -> List[Chunk]:
+    """
+    Greedily pack paragraphs into chunks of at most CHUNK_SIZE characters
+    (a single longer paragraph becomes its own chunk).
+    
+    Chunks of a document share its metadata dict; it is only read
+    downstream, so there is no need to copy it per chunk.
+    """
     chunks = []
 
     for doc in documents:
-        paragraphs = [p.strip() for p in doc.content.split("\n") if p.strip()]
-        buffer = ""
+        parts: List[str] = []
+        size = 0
 
-        for para in paragraphs:
-            if len(buffer) + len(para) <= CHUNK_SIZE:
-                buffer += " " + para
-            else:
-                chunks.append(
-                    Chunk(
-                        text=buffer.strip(),
-                        metadata=doc.metadata.copy()  # Inherit all metadata
-                    )
-                )
-                buffer = para
-
-        if buffer:
-            chunks.append(
-                Chunk(
-                    text=buffer.strip(),
-                    metadata=doc.metadata.copy()
-                )
-            )
+        for para in _RE_PARA.split(doc.content):
+            para = para.strip()
+            if not para:
+                continue
+
+            if parts and size + 1 + len(para) > CHUNK_SIZE:
+                chunks.append(Chunk(text=" ".join(parts), metadata=doc.metadata))
+                parts = []
+                size = 0
+
+            size += len(para) + (1 if parts else 0)
+            parts.append(para)
+
+        if parts:
+            chunks.append(Chunk(text=" ".join(parts), metadata=doc.metadata))
 
     return chunks
 
 
 # 3. FAISS Vector Store
-def to_langchain_documents(chunks: List[Chunk]) -> List[LC_Document]:
+def to_langchain_documents(chunks: List[Chunk], ids: Optional[List[str]] = None) -> List[LC_Document]:
     return [
         LC_Document(
+            id=ids[i] if ids else None,
             page_content=chunk.text,
             metadata=chunk.metadata
         )
-        for chunk in chunks
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that persists vectors in a local SQLite table keyed
+    by the sha256 of model name + text, so unchanged chunks and repeated
+    queries are never sent to the API twice.
+    """
+
+    def __init__(self, inner: OpenAIEmbeddings, cache_path: str = EMBED_CACHE_PATH):
+        self.inner = inner
+        self.model = inner.model
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        # Query LRU shared by embed_query and aembed_query (an lru_cache
+        # can't wrap the coroutine)
+        self._query_lru: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256((self.model + "\0" + text).encode("utf-8")).digest()
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        hits = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT hash, vec FROM embeddings WHERE hash IN ({','.join('?' * len(batch))})",
+                batch
+            )
+            for key, blob in rows:
+                hits[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return hits
+
+    def _partition(self, texts: List[str]):
+        """
+        Returns (keys, cached vectors by key, texts to embed by key).
+        """
+        keys = [self._key(text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+
+        # Only send texts we have never embedded (deduplicated) to the API
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in misses:
+                misses[key] = text
+
+        return keys, cached, misses
+
+    def _store(self, misses: Dict[bytes, str], vectors: List[List[float]],
+               cached: Dict[bytes, List[float]]) -> None:
+        rows: List[Tuple[bytes, bytes]] = []
+        for key, vec in zip(misses, vectors):
+            cached[key] = vec
+            rows.append((key, np.asarray(vec, dtype=np.float32).tobytes()))
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)", rows
+            )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, misses = self._partition(texts)
+        if misses:
+            self._store(misses, self.inner.embed_documents(list(misses.values())), cached)
+        return [cached[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, misses = self._partition(texts)
+        if misses:
+            self._store(misses, await self.inner.aembed_documents(list(misses.values())), cached)
+        return [cached[key] for key in keys]
+
+    def _query_lru_get(self, text: str) -> Optional[List[float]]:
+        vec = self._query_lru.get(text)
+        if vec is None:
+            return None
+        self._query_lru.move_to_end(text)
+        return list(vec)
+
+    def _query_lru_put(self, text: str, vec: List[float]) -> None:
+        self._query_lru[text] = tuple(vec)
+        self._query_lru.move_to_end(text)
+        if len(self._query_lru) > QUERY_CACHE_SIZE:
+            self._query_lru.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        vec = self._query_lru_get(text)
+        if vec is None:
+            vec = self.embed_documents([text])[0]
+            self._query_lru_put(text, vec)
+        return vec
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vec = self._query_lru_get(text)
+        if vec is None:
+            vec = (await self.aembed_documents([text]))[0]
+            self._query_lru_put(text, vec)
+        return vec
+
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> Embeddings:
+    # Shared by build/load so the HTTP client, SQLite handle and query LRU are reused
+    return CachedEmbeddings(
+        OpenAIEmbeddings(
+            model=EMBED_MODEL, chunk_size=EMBED_BATCH, max_retries=EMBED_MAX_RETRIES
+        )
+    )
+
+
+async def embed_chunks(chunks: List[Chunk], embeddings: Embeddings) -> np.ndarray:
+    """
+    Embed chunk texts in batches of EMBED_BATCH so each request carries
+    many inputs instead of one round-trip per chunk, with up to
+    EMBED_CONCURRENCY batches in flight to hide network latency.
+    
+    Each batch is written straight into one preallocated, C-contiguous
+    float32 (len(chunks), dim) array, which faiss can consume as is.
+    """
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+    arena: Optional[np.ndarray] = None
+
+    async def embed_batch(start: int) -> None:
+        nonlocal arena
+        batch_texts = [chunk.text for chunk in chunks[start:start + EMBED_BATCH]]
+        async with semaphore:
+            batch_vectors = await embeddings.aembed_documents(batch_texts)
+        if arena is None:
+            arena = np.empty((len(chunks), len(batch_vectors[0])), dtype=np.float32)
+        arena[start:start + len(batch_vectors)] = batch_vectors
+
+    await asyncio.gather(
+        *(embed_batch(start) for start in range(0, len(chunks), EMBED_BATCH))
+    )
+    return arena
+
+
+def assign_chunk_ids(chunks: List[Chunk]) -> List[str]:
+    """
+    Stable per-file ids ("<filename>#<n>") so a file's vectors can be
+    deleted when it changes.
+    """
+    counters: Dict[str, int] = {}
+    ids = []
+    for chunk in chunks:
+        filename = chunk.metadata["filename"]
+        n = counters.get(filename, 0)
+        counters[filename] = n + 1
+        ids.append(f"{filename}#{n}")
+    return ids
+
+
+def load_manifest() -> Dict[str, Dict]:
+    """
+    Returns filename -> {"sha256": str, "mtime_ns": int, "size": int,
+    "chunk_ids": [str, ...]}.
+    
+    The file also records the embedding model and chunk size; an index
+    built with different settings (or before they were recorded), or an
+    unreadable manifest, yields an empty manifest, so the index is rebuilt
+    rather than mixed with new vectors.
+    """
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("embed_model") != EMBED_MODEL or data.get("chunk_size") != CHUNK_SIZE:
+            return {}
+        return data["files"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        print("  ⚠️  Warning: Index manifest is unreadable, rebuilding the index")
+        return {}
+
+
+def save_manifest(manifest: Dict[str, Dict]) -> None:
+    _write_json_atomic(
+        MANIFEST_PATH,
+        {"embed_model": EMBED_MODEL, "chunk_size": CHUNK_SIZE, "files": manifest},
+        indent=2, sort_keys=True
+    )
+
+
+def record_files(manifest: Dict[str, Dict], file_states: Dict[str, Dict],
+                 chunks: List[Chunk], ids: List[str]) -> None:
+    for filename, state in file_states.items():
+        manifest[filename] = {**state, "chunk_ids": []}
+    for chunk, chunk_id in zip(chunks, ids):
+        manifest[chunk.metadata["filename"]]["chunk_ids"].append(chunk_id)
+
+
+def create_index(vectors: np.ndarray) -> faiss.Index:
+    """
+    HNSW graph index over scalar-quantized vectors: approximate search
+    that visits far fewer vectors per query than the exhaustive
+    IndexFlatL2 used by FAISS.from_documents, and reads fewer bytes per
+    distance computation.
+    
+    The index is trained on `vectors` (if the quantizer needs it) but
+    left empty; callers add vectors themselves.
+    """
+    index = faiss.IndexHNSWSQ(vectors.shape[1], INDEX_QUANTIZATION, HNSW_M)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    if not index.is_trained:
+        index.train(vectors)
+    return index
+
+
+def add_to_vector_store(vector_store: FAISS, chunks: List[Chunk],
+                        ids: List[str], vectors: np.ndarray) -> None:
+    """
+    Equivalent of FAISS.add_embeddings for an already packed float32
+    matrix: one index.add call, no per-vector conversion.
+    """
+    start = vector_store.index.ntotal
+    vector_store.index.add(vectors)
+    vector_store.docstore.add(dict(zip(ids, to_langchain_documents(chunks, ids))))
+    vector_store.index_to_docstore_id.update(
+        {start + i: chunk_id for i, chunk_id in enumerate(ids)}
+    )
+
+
+async def build_vector_store(chunks: List[Chunk], file_states: Dict[str, Dict]) -> FAISS:
+    embeddings = get_embeddings()
+    vectors = await embed_chunks(chunks, embeddings)
+    ids = assign_chunk_ids(chunks)
+    vector_store = FAISS(
+        embedding_function=embeddings,
+        index=create_index(vectors),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={}
+    )
+    add_to_vector_store(vector_store, chunks, ids, vectors)
+    vector_store.save_local(FAISS_INDEX_DIR)
+
+    manifest: Dict[str, Dict] = {}
+    record_files(manifest, file_states, chunks, ids)
+    save_manifest(manifest)
+    print(f"✓ Vector store saved to {FAISS_INDEX_DIR}")
+    return vector_store
+
+
+def drop_chunks(vector_store: FAISS, ids: List[str]) -> None:
+    """
+    Remove chunks by id. HNSW indexes do not support remove_ids, so the
+    index is rebuilt from the stored vectors of the remaining chunks
+    (decoded with reconstruct_n); the embeddings client is not used.
+    """
+    drop = set(ids)
+    kept = [
+        (position, doc_id)
+        for position, doc_id in sorted(vector_store.index_to_docstore_id.items())
+        if doc_id not in drop
+    ]
+
+    old_index = vector_store.index
+    all_vectors = old_index.reconstruct_n(0, old_index.ntotal).reshape(old_index.ntotal, old_index.d)
+    kept_vectors = np.ascontiguousarray(
+        all_vectors[[position for position, _ in kept]], dtype=np.float32
+    )
+    index = create_index(kept_vectors)
+    index.add(kept_vectors)
+
+    vector_store.index = index
+    vector_store.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(kept)}
+    vector_store.docstore.delete(list(drop))
+
+
+async def update_vector_store(vector_store: FAISS, manifest: Dict[str, Dict],
+                              file_states: Dict[str, Dict]) -> FAISS:
+    """
+    Bring a loaded index in line with the knowledge base: drop vectors of
+    changed or removed files and embed only changed or new files.
+    """
+    changed = [
+        filename for filename, state in file_states.items()
+        if manifest.get(filename, {}).get("sha256") != state["sha256"]
+    ]
+    removed = [filename for filename in manifest if filename not in file_states]
+
+    # Same content but new mtime/size (e.g. touched): just record the new stat
+    restatted = [
+        filename for filename, state in file_states.items()
+        if filename not in changed and (
+            manifest[filename].get("mtime_ns") != state["mtime_ns"]
+            or manifest[filename].get("size") != state["size"]
+        )
     ]
+    for filename in restatted:
+        manifest[filename].update(file_states[filename])
 
+    if not changed and not removed:
+        if restatted:
+            save_manifest(manifest)
+        print("✓ Knowledge base unchanged, reusing index")
+        return vector_store
+
+    print(f"→ Updating index: {len(changed)} changed/new, {len(removed)} removed file(s)")
+
+    stale_ids = [
+        chunk_id
+        for filename in changed + removed
+        for chunk_id in manifest.get(filename, {}).get("chunk_ids", [])
+    ]
+    if stale_ids:
+        drop_chunks(vector_store, stale_ids)
+    for filename in removed:
+        del manifest[filename]
+
+    documents = await asyncio.to_thread(load_documents, changed)
+    chunks = chunk_documents(documents)
+    ids = assign_chunk_ids(chunks)
+    if chunks:
+        vectors = await embed_chunks(chunks, vector_store.embeddings)
+        add_to_vector_store(vector_store, chunks, ids, vectors)
+    record_files(manifest, {f: file_states[f] for f in changed}, chunks, ids)
 
-def build_vector_store(chunks: List[Chunk]) -> FAISS:
-    embeddings = OpenAIEmbeddings()
-    lc_docs = to_langchain_documents(chunks)
-    vector_store = FAISS.from_documents(lc_docs, embeddings)
     vector_store.save_local(FAISS_INDEX_DIR)
+    save_manifest(manifest)
     print(f"✓ Vector store saved to {FAISS_INDEX_DIR}")
     return vector_store
 
 
 def load_vector_store() -> FAISS:
-    embeddings = OpenAIEmbeddings()
-    return FAISS.load_local(
+    embeddings = get_embeddings()
+    vector_store = FAISS.load_local(
         FAISS_INDEX_DIR,
         embeddings,
         allow_dangerous_deserialization=True
     )
+    # efSearch is a query-time knob; apply the current setting to old indexes too
+    if hasattr(vector_store.index, "hnsw"):
+        vector_store.index.hnsw.efSearch = HNSW_EF_SEARCH
+    return vector_store
 
 
-def retrieve_chunks(vector_store: FAISS, query: str, k: int) -> List[Chunk]:
-    docs = vector_store.similarity_search(query, k=k)
+def _effective_ordinal(metadata: Dict[str, str]) -> int:
+    # Every indexed chunk carries effective_ordinal: indexes written before it existed
+    # have no recorded manifest settings and are rebuilt on load
+    return int(metadata.get("effective_ordinal", -1))
+
+
+def retrieve_chunks(vector_store: FAISS, query_vector: List[float], k: int) -> RetrievedChunks:
+    docs = vector_store.similarity_search_by_vector(query_vector, k=k)
     
     chunks = [
         Chunk(
@@ -344,62 +887,51 @@ def retrieve_chunks(vector_store: FAISS, query: str, k: int) -> List[Chunk]:
         for doc in docs
     ]
     
-    # for i, chunk in enumerate(chunks, 1):
-    #     print(f"\nChunk {i}:")
-    #     print(f"  Filename: {chunk.metadata.get('filename')}")
-    #     print(f"  Type: {chunk.metadata.get('doc_type')}")
-    #     print(f"  Date: {chunk.metadata.get('effective_date', 'Unknown')}")
+    for i, chunk in enumerate(chunks, 1):
+        _dbg(f"\nChunk {i}:")
+        _dbg(f"  Filename: {chunk.metadata.get('filename')}")
+        _dbg(f"  Type: {chunk.metadata.get('doc_type')}")
+        _dbg(f"  Date: {chunk.metadata.get('effective_date', 'Unknown')}")
     
-    return chunks
+    return RetrievedChunks(
+        chunks=chunks,
+        doc_types=np.array([chunk.metadata.get("doc_type", "") for chunk in chunks], dtype=str),
+        ordinals=np.fromiter(
+            (_effective_ordinal(chunk.metadata) for chunk in chunks),
+            dtype=np.int32,
+            count=len(chunks)
+        )
+    )
 
 
 # 4. Noise Filtering
-def filter_noise(chunks: List[Chunk]) -> List[Chunk]:
-
-    
-    filtered = [
-        chunk for chunk in chunks
-        if chunk.metadata.get("doc_type") == "policy"
-    ]
+def filter_noise(retrieved: RetrievedChunks) -> RetrievedChunks:
+    filtered = retrieved.select(retrieved.doc_types == "policy")
     
-    print(f"✓ Kept {len(filtered)} policy chunks (filtered {len(chunks) - len(filtered)} noise)")
+    _dbg(f"✓ Kept {len(filtered)} policy chunks (filtered {len(retrieved) - len(filtered)} noise)")
     return filtered
 
 
 # 5. Conflict Resolution (IMPROVED)
-def resolve_policy_conflicts(chunks: List[Chunk]) -> Chunk:
-    
-    # Parse effective dates from metadata
-    policies_with_dates = []
-    
-    for chunk in chunks:
-        effective_date_str = chunk.metadata.get("effective_date")
-        if effective_date_str:
-            try:
-                effective_date = datetime.fromisoformat(effective_date_str)
-                policies_with_dates.append((effective_date, chunk))
-                print(f"  → {chunk.metadata['filename']}: {effective_date.strftime('%Y-%m-%d')}")
-            except ValueError:
-                print(f"  ⚠️  Warning: Invalid date format in metadata for {chunk.metadata.get('filename')}")
+def resolve_policy_conflicts(retrieved: RetrievedChunks) -> Chunk:
+    """
+    Return the chunk with the newest effective date (first one on ties).
     
-    if not policies_with_dates:
+    Chunks are ranked by the integer effective_ordinal stored at ingest
+    time, so this is a single argmax with no date parsing.
+    """
+    if not len(retrieved) or retrieved.ordinals.max() < 0:
         print("  ⚠️  WARNING: No dated policies found, using first available chunk")
-        return chunks[0]
-    
-    # Sort by date (newest first)
-    policies_with_dates.sort(key=lambda x: x[0], reverse=True)
-    
-    most_recent = policies_with_dates[0]
-    print(f"\n✓ Selected most recent policy:")
-    
-    return most_recent[1]
+        return retrieved.chunks[0]
 
+    most_recent = retrieved.chunks[int(np.argmax(retrieved.ordinals))]
+    _dbg(f"\n✓ Selected most recent policy: {most_recent.metadata.get('filename')}")
 
-# 6. Answer Generation
-def generate_answer(policy_chunk: Chunk, query: str) -> str:    
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    return most_recent
 
-    prompt = f"""You are an HR policy assistant.
+
+# 6. Answer Generation
+ANSWER_PROMPT = """You are an HR policy assistant.
 
 Rules:
 - Use ONLY the policy text below.
@@ -411,7 +943,7 @@ Rules:
 - The source filename will be provided programmatically.
 
 Policy Text:
-{policy_chunk.text}
+{policy_text}
 
 Question:
 {query}
@@ -421,38 +953,181 @@ Answer format:
 Sources: <filename>
 """
 
-    response = llm.invoke(prompt).content.strip()
-    response = re.sub(r"Sources:.*", "", response).strip()
+
+async def generate_answer(policy_chunk: Chunk, query: str) -> str:
+    llm = _get_llm()
+
+    prompt = ANSWER_PROMPT.format(policy_text=policy_chunk.text, query=query)
+
+    response = (await llm.ainvoke(prompt)).content.strip()
+    # Drop the model's own trailing Sources line; the real filename is appended below
+    response = response.rsplit("Sources:", 1)[0].rstrip()
     response += f"\nSources: {policy_chunk.metadata['filename']}"
 
     return response
 
 
-# 7. Pipeline Orchestration
-def run_pipeline(query: str):
+# 7. Answer Cache
+def corpus_fingerprint(file_states: Dict[str, Dict]) -> str:
+    """
+    Single hash over the knowledge base and every setting that shapes an
+    answer (models, chunking, retrieval depth, prompt); cached answers are
+    only valid for the combination they were generated from.
+    """
+    settings = f"{EMBED_MODEL}\0{LLM_MODEL}\0{CHUNK_SIZE}\0{TOP_K}\0"
+    digest = hashlib.sha256(settings.encode("utf-8"))
+    digest.update(hashlib.sha256(ANSWER_PROMPT.encode("utf-8")).digest())
+    for filename in sorted(file_states):
+        digest.update(f"{filename}\0{file_states[filename]['sha256']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class AnswerCache:
+    """
+    Two-tier answer cache persisted in ANSWER_CACHE_DIR:
+    1. exact match on the normalized query string
+    2. nearest cached query by cosine similarity (normalized vectors in an
+       inner-product FAISS index), reused at >= SEMANTIC_CACHE_THRESHOLD
+    
+    The cache is discarded when the corpus fingerprint changes.
+    """
+
+    def __init__(self, fingerprint: str, cache_dir: str = ANSWER_CACHE_DIR):
+        self.fingerprint = fingerprint
+        self.cache_dir = cache_dir
+        self.queries: List[str] = []
+        self.answers: List[str] = []
+        self.exact: Dict[str, int] = {}
+        self.index: Optional[faiss.IndexFlatIP] = None
+        self._load()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.cache_dir, "answers.json")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, "queries.faiss")
+
+    def _load(self) -> None:
+        if not (os.path.exists(self._meta_path) and os.path.exists(self._index_path)):
+            return
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("fingerprint") != self.fingerprint:
+                print("→ Knowledge base changed, discarding cached answers")
+                return
+            queries, answers = meta["queries"], meta["answers"]
+            index = faiss.read_index(self._index_path)
+        except (OSError, ValueError, KeyError, RuntimeError):
+            print("  ⚠️  Warning: Answer cache is unreadable, discarding it")
+            return
+        # The two files are written separately; a run interrupted in between leaves them out of step
+        if index.ntotal != len(answers) or len(queries) != len(answers):
+            print("  ⚠️  Warning: Answer cache is inconsistent, discarding it")
+            return
+        self.queries = queries
+        self.answers = answers
+        self.exact = {normalize_query(q): i for i, q in enumerate(self.queries)}
+        self.index = index
+
+    def _save(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _write_atomic(self._index_path, lambda tmp_path: faiss.write_index(self.index, tmp_path))
+        _write_json_atomic(
+            self._meta_path,
+            {"fingerprint": self.fingerprint, "queries": self.queries, "answers": self.answers}
+        )
+
+    @staticmethod
+    def _as_unit_row(query_vector: List[float]) -> np.ndarray:
+        vec = np.asarray([query_vector], dtype=np.float32)
+        faiss.normalize_L2(vec)
+        return vec
+
+    def get(self, query: str) -> Optional[str]:
+        idx = self.exact.get(normalize_query(query))
+        return self.answers[idx] if idx is not None else None
+
+    def get_similar(self, query_vector: List[float]) -> Optional[str]:
+        if self.index is None or self.index.ntotal == 0:
+            return None
+        scores, ids = self.index.search(self._as_unit_row(query_vector), 1)
+        if ids[0, 0] >= 0 and scores[0, 0] >= SEMANTIC_CACHE_THRESHOLD:
+            return self.answers[ids[0, 0]]
+        return None
+
+    def add(self, query: str, query_vector: List[float], answer: str) -> None:
+        vec = self._as_unit_row(query_vector)
+        if self.index is None:
+            self.index = faiss.IndexFlatIP(vec.shape[1])
+        self.index.add(vec)
+        self.exact[normalize_query(query)] = len(self.answers)
+        self.queries.append(query)
+        self.answers.append(answer)
+        self._save()
+
+
+# 8. Pipeline Orchestration
+async def prepare_vector_store(manifest: Dict[str, Dict], file_states: Dict[str, Dict]) -> FAISS:
+    # An index without a manifest can't be diffed, so it is rebuilt
+    if os.path.exists(FAISS_INDEX_DIR) and manifest:
+        print("\n→ Loading existing FAISS index...")
+        vector_store = await asyncio.to_thread(load_vector_store)
+        return await update_vector_store(vector_store, manifest, file_states)
+
+    print("\n→ Building FAISS index from scratch...")
+    documents = await asyncio.to_thread(load_documents, list(file_states))
+    chunks = chunk_documents(documents)
+    return await build_vector_store(chunks, file_states)
+
+
+async def arun_pipeline(query: str):
     print("\n" + "="*80)
     print("RUNNING RAG PIPELINE")
     print("="*80)
     
-    if os.path.exists(FAISS_INDEX_DIR):
-        print("\n→ Loading existing FAISS index...")
-        vector_store = load_vector_store()
+    manifest = load_manifest()
+    file_states = scan_knowledge_base(manifest)
+    if not (os.path.exists(FAISS_INDEX_DIR) and manifest):
+        # The index is about to be rebuilt from scratch; don't serve answers from the old one
+        shutil.rmtree(ANSWER_CACHE_DIR, ignore_errors=True)
+    answer_cache = AnswerCache(corpus_fingerprint(file_states))
+
+    answer = answer_cache.get(query)
+    from_cache = answer is not None
+    if not from_cache:
+        # Embed the query while the index is loaded, updated or built
+        query_task = asyncio.create_task(get_embeddings().aembed_query(query))
+        try:
+            vector_store = await prepare_vector_store(manifest, file_states)
+        except BaseException:
+            query_task.cancel()
+            raise
+        query_vector = await query_task
+
+        answer = answer_cache.get_similar(query_vector)
+        from_cache = answer is not None
+
+    if from_cache:
+        print("\n✓ Answer served from cache")
     else:
-        print("\n→ Building FAISS index from scratch...")
-        documents = load_documents()
-        chunks = chunk_documents(documents)
-        vector_store = build_vector_store(chunks)
+        retrieved = retrieve_chunks(vector_store, query_vector, TOP_K)
+        filtered = filter_noise(retrieved)
 
-    retrieved = retrieve_chunks(vector_store, query, TOP_K)
-    filtered = filter_noise(retrieved)
+        if not filtered:
+            print("\n⚠️  No relevant policy documents found.")
+            return
+
+        authoritative_policy = resolve_policy_conflicts(filtered)
+        answer = await generate_answer(authoritative_policy, query)
+        answer_cache.add(query, query_vector, answer)
 
-    if not filtered:
-        print("\n⚠️  No relevant policy documents found.")
-        return
-    
-    authoritative_policy = resolve_policy_conflicts(filtered)
-    answer = generate_answer(authoritative_policy, query)
-    
     print("\n" + "="*80)
     print("FINAL ANSWER")
     print("="*80)
@@ -460,6 +1135,11 @@ def run_pipeline(query: str):
     print("="*80 + "\n")
 
 
+def run_pipeline(query: str):
+    runner = uvloop.run if uvloop is not None else asyncio.run
+    runner(arun_pipeline(query))
+
+
 # Entry Point
 if __name__ == "__main__":
     user_query = input("\nEnter your query: ")